@@ -1,7 +1,283 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import matplotlib.cm as cmx
+import matplotlib.colors
+from collections import namedtuple
+from numba import njit
 from car import Car
 
+# car/powertrain parameters flattened to scalars and plain arrays, passed by
+# value into the JIT kernels instead of Car/Engine/Motor attribute chains
+CarParams = namedtuple('CarParams', ['hybrid','power_split','m','g','rho_air','cd','a_front',
+                                     'wheel_radius','eng_trans','eng_maxrpm','eng_minrpm',
+                                     'power_rpm','power_hp','motor_trans','motor_maxrpm',
+                                     'motor_torque_con'])
+
+
+@njit(cache=True)
+def _interp1(x, xp, fp):
+    '''
+    Scalar linear interpolation with constant extrapolation at both ends
+    '''
+    if x <= xp[0]:
+        return fp[0]
+    if x >= xp[-1]:
+        return fp[-1]
+    j = np.searchsorted(xp, x) - 1
+    w = (x - xp[j])/(xp[j+1] - xp[j])
+    return fp[j] + w*(fp[j+1] - fp[j])
+
+
+@njit(cache=True)
+def _v_lim_hybrid(vin, gear, rpm0, sin_elev, p):
+    '''
+    Calculates torque-limited acceleration and max wheel rpm (hybrid vehicles only)
+    - Calculate maximum acceleration allowed at the current power output
+    - Check rpm at each step and determine whether to shift gear
+    ICE+EM
+    '''
+
+    # calculate rpm and check for shifting conditions
+    r = 0.95                                             # set the max rpm
+    rpm_list = rpm0*p.eng_trans[2:]*p.eng_trans[0]*p.eng_trans[1]   # rpm at all gears
+    gear_new = gear
+
+    # calculate Power output
+    if (gear == 1 and rpm_list[0]<p.eng_minrpm):
+        rpm_at_gear_new = rpm_list[0]
+        p_ICE = _interp1(p.eng_minrpm, p.power_rpm, p.power_hp)                  # use constant extrapolation for v near 0
+    else:
+        rpm_idx = -1                                                       # index of first possible rpm
+        for k in range(rpm_list.shape[0]):
+            if (p.eng_maxrpm*r>rpm_list[k]) and (p.eng_minrpm<rpm_list[k]):
+                rpm_idx = k
+                break
+        if rpm_idx == -1:
+            rpm_at_gear_new = p.eng_maxrpm
+            if gear == 0:                                                  # for initial gear calculation at apex
+                if np.min(rpm_list)>p.eng_maxrpm*r:
+                    gear_new = rpm_list.shape[0]
+                elif np.max(rpm_list)<p.eng_minrpm*r:
+                    gear_new = 1
+        else:
+            gear_new = rpm_idx+1                                           # gear chosen for next step
+            rpm_at_gear_new = rpm_list[rpm_idx]
+        p_ICE = _interp1(rpm_at_gear_new, p.power_rpm, p.power_hp)             # ICE power output after shifting
+
+    # Power/rpm -> torque at the engine output (*gear ratio) -> torque at the wheel -> force at the wheel -> acceleration
+    omega_ICE = (rpm_at_gear_new/60)*(2*np.pi)                             # angular velocity [rad/s] revolution per minute / 60s * 2pi
+    if omega_ICE != 0:
+        torque_ICE_at_wheel = (p_ICE*745.7/omega_ICE)*p.eng_trans[gear_new+1]  # always use maximum torque during acceleration
+    else:
+        torque_ICE_at_wheel = 0.
+
+    # torque limited acceleration
+    torque_EM_at_wheel = p.motor_torque_con*p.motor_trans
+    omega_at_wheel = vin/(p.wheel_radius*0.0254)
+    total_power = (torque_EM_at_wheel+torque_ICE_at_wheel)*omega_at_wheel
+    p_elevation = p.m*p.g*sin_elev*vin
+    p_drag = 0.5*p.rho_air*p.cd*p.a_front*vin**3
+
+    effective_power = total_power - p_elevation - p_drag
+    a_tor = (effective_power/omega_at_wheel)/(p.wheel_radius*0.0254*p.m)
+
+    # maxrpm determined by transmission
+    wheel_maxrpm_ICE = p.eng_maxrpm/(p.eng_trans[gear_new+1]*p.eng_trans[0]*p.eng_trans[1])
+    wheel_maxrpm_EM = p.motor_maxrpm/p.motor_trans
+    maxrpm = min(wheel_maxrpm_EM,wheel_maxrpm_ICE)
+
+    return a_tor, maxrpm, gear_new
+
+
+@njit(cache=True)
+def _v_lim_electric(vin, rpm0, sin_elev, p):
+    '''
+    Calculates torque-limited acceleration and max wheel rpm
+    EM only
+    '''
+
+    omega_at_wheel = rpm0/60*2*np.pi
+
+    # torque-limited velocity [p.m/s]
+    p_elevation = p.m*p.g*sin_elev*vin
+    p_drag = 0.5*p.rho_air*p.cd*p.a_front*vin**3
+    effective_power = p.motor_torque_con*p.motor_trans*omega_at_wheel-p_elevation-p_drag
+
+    a_tor = (effective_power/omega_at_wheel)/(p.wheel_radius*0.0254*p.m)
+
+    # rpm-limited velocity [p.m/s]
+    maxrpm = p.motor_maxrpm/p.motor_trans
+
+    return a_tor, maxrpm
+
+
+@njit(cache=True)
+def _calc_velocity_3D(vin, ap, gear, roc, sin_elev, alimy, ds, p):
+    '''
+    Calculates velocity at the next discretized step
+    Returns velocity, gear, ICE/EM power draw, time and the limiting mechanism
+    (0-power, 1-traction, 2-lateral traction, 3-rpm)
+    '''
+
+    # calculate rpm and check for shifting conditions
+    rpm0 = vin/(p.wheel_radius*0.0254*2*np.pi)*60    # rpm of wheels at current velocity
+
+    if p.hybrid == 1:
+        a_tor, maxrpm, gear_new = _v_lim_hybrid(vin, gear, rpm0, sin_elev, p)
+    else:
+        a_tor, maxrpm = _v_lim_electric(vin, rpm0, sin_elev, p)
+        gear_new = 1
+
+    # torque-limited velocity [m/s]
+    v_tor = np.sqrt(2*a_tor*ds+vin**2)    # v^2-vi^2 = 2a*ds
+    t_tor = (v_tor-vin)/a_tor
+
+    # traction-limited velocity [m/s]
+    a_elev = p.g*np.abs(sin_elev)                                   # loss in traction due to elevation change
+    a_trac = np.sqrt(alimy**2-ap**2)-a_elev
+    v_trac = np.sqrt(2*a_trac*ds+vin**2)
+    t_trac = (v_trac-vin)/a_trac
+
+    # lateral traction-limited velocity [m/s]
+    v_trac_l = np.sqrt(alimy*roc)
+    a_trac_l = (v_trac_l**2-vin**2)/(2*ds)
+    t_trac_l = (v_trac_l-vin)/a_trac_l
+
+    # rpm-limited velocity [m/s]
+    v_rpm = maxrpm/60*(p.wheel_radius*0.0254*2*np.pi)
+    a_rpm = (v_rpm**2-vin**2)/(2*ds)
+    if a_rpm == 0:
+        t_rpm = ds/v_rpm
+    else:
+        t_rpm = (v_rpm-vin)/a_rpm
+
+    # pick the binding limit with a scalar comparison chain (ties keep the earlier branch,
+    # matching the old np.min + equality-compare priority without re-comparing floats)
+    v = v_tor
+    t = t_tor
+    a = a_tor
+    limit = 0
+    if v_trac < v:
+        v = v_trac
+        t = t_trac
+        a = a_trac
+        limit = 1
+    if v_trac_l < v:
+        v = v_trac_l
+        t = t_trac_l
+        a = a_trac_l
+        limit = 2
+    if v_rpm < v:
+        v = v_rpm
+        t = t_rpm
+        a = a_rpm
+        limit = 3
+
+    p_ICE = p.m * a * v * (p.hybrid*p.power_split)
+    p_EM = p.m * a * v - p_ICE
+
+    return v, gear_new, p_ICE, p_EM, t, limit
+
+
+@njit(cache=True)
+def _integrate(steps, r, sin_elev, cos_elev, apex, v, gear, alimy, ds, p):
+    '''
+    Forward/backward integration state machine (JIT-compiled)
+    Fills v, gear in place and returns ICE/EM power draw, time per step,
+    the limiting mechanism per step (-1 for untouched points) and an event
+    log (code, apex index, step index) to be printed by the caller
+    '''
+
+    p_ICE_list = np.zeros(steps)
+    p_EM_list = np.zeros(steps)
+    time = np.zeros(steps)
+    limit = np.full(steps, -1, dtype=np.int64)
+    events = np.zeros((4*steps+16, 3), dtype=np.int64)
+    n_events = 0
+
+    i = 0
+    apex_idx = 0
+    n_apex = apex.shape[0]
+    forward = True
+    gear[0] = 1
+
+    while i<steps:
+        if forward:                                                         # forward
+            i1 = (i+1) % steps
+            if v[i1]==0:
+                ap = v[i]**2/r[i1]*cos_elev[i]
+                if alimy>ap:                                                # below traction limit
+                    vi, gi, pi, pe, ti, li = _calc_velocity_3D(v[i], ap, int(gear[i]), r[i1], sin_elev[i1], alimy, ds, p)
+                    v[i1] = vi
+                    gear[i1] = gi
+                    p_ICE_list[i1] = pi
+                    p_EM_list[i1] = pe
+                    time[i1] = ti
+                    limit[i1] = li
+                    i = i1                                                  # step forward
+                else:                                                       # traction is lost
+                    forward = False
+                    apex_idx = (apex_idx+1) % n_apex
+                    if n_events < events.shape[0]:
+                        events[n_events, 0] = 1
+                        events[n_events, 1] = apex_idx
+                        events[n_events, 2] = i
+                        n_events += 1
+                    i = apex[apex_idx]
+            else:                                                           # check if velocity at next apex can be achieved with the current gear
+                if np.min(v)==0:                                            # reaching an apex without braking
+                    i = i1
+                    apex_idx = (apex_idx+1) % n_apex
+                else:
+                    if n_events < events.shape[0]:
+                        events[n_events, 0] = 2
+                        events[n_events, 1] = apex_idx
+                        events[n_events, 2] = i
+                        n_events += 1
+                    break
+        else:                                                               # backward
+            ap = v[i]**2/r[i-1]*cos_elev[i]
+            i0 = (i-1) % steps
+            if v[i-1]==0:                                                   # if velocity is not yet calculated
+                vi, gi, pi, pe, ti, li = _calc_velocity_3D(v[i], ap, int(gear[i]), r[i0], sin_elev[i0], alimy, ds, p)
+                v[i-1] = vi
+                gear[i-1] = gi
+                p_ICE_list[i-1] = pi
+                p_EM_list[i-1] = pe
+                time[i-1] = ti
+                limit[i-1] = li
+                i-=1
+            else:                                                           # if velocity is calculated from forward integration
+                if alimy<ap:                                                # if the previous point is an apex; loosing traction
+                    if n_events < events.shape[0]:
+                        events[n_events, 0] = 3
+                        events[n_events, 1] = apex_idx
+                        events[n_events, 2] = i
+                        n_events += 1
+                    forward = True
+                    i = apex[apex_idx]
+                else:                                                       # if still can accelerate
+                    vb, gearb, pb, peb, tb, lb = _calc_velocity_3D(v[i], ap, int(gear[i]), r[i0], sin_elev[i0], alimy, ds, p)
+                    if vb < v[i-1]:                                         # continue backward integration
+                        v[i-1] = vb
+                        gear[i-1] = gearb
+                        p_ICE_list[i-1] = pb
+                        p_EM_list[i-1] = peb
+                        time[i-1] = tb
+                        limit[i-1] = lb
+                        i-=1
+                    else:                                                   # found brake point
+                        if n_events < events.shape[0]:
+                            events[n_events, 0] = 4
+                            events[n_events, 1] = apex_idx
+                            events[n_events, 2] = i
+                            n_events += 1
+                        forward = True
+                        i = apex[apex_idx]
+
+    return p_ICE_list, p_EM_list, time, limit, events[:n_events]
+
+
 class LapSim:
     '''
     A lap time simulator (point-mass) for 3D tracks
@@ -41,6 +317,13 @@ class LapSim:
 
         self.car = kwargs.pop('car',0)                  # Car class
 
+        self.verbose = kwargs.pop('verbose',False)      # print integration diagnostics
+        self.plot = kwargs.pop('plot',False)            # draw track/velocity plots after lap_time
+
+        self._eta_interp = None                         # cached fuel-map interpolator (built on first use)
+        self._geom_cache = None                         # cached track geometry for repeated lap_time calls
+        self._geom_cache_key = None
+
 
     @classmethod
     def init_ellipse(cls, **kwargs):
@@ -81,14 +364,24 @@ class LapSim:
         Calculates lap time
         '''
 
-        # interpolate equidistant points on the track
-        self.pts_interp, self.ds, self.track_len = self.discretize()
+        # track geometry depends only on the input points and resolution, not on the car;
+        # reuse it across repeated calls (parameter sweeps re-run the same track)
+        if self._geom_cache_key == (id(self.pts), self.steps):
+            (self.pts_interp, self.ds, self.track_len, self.dpds, self.d2pds2,
+             self.r, self.apex, self.elevation, self.s) = self._geom_cache
+        else:
+            # interpolate equidistant points on the track
+            self.pts_interp, self.ds, self.track_len = self.discretize()
 
-        # calculate radius of curvature
-        self.dpds, self.d2pds2, self.r = self.roc()
+            # calculate radius of curvature
+            self.dpds, self.d2pds2, self.r = self.roc()
 
-        # find apex locations
-        self.apex = self.find_apex()
+            # find apex locations
+            self.apex = self.find_apex()
+
+            self._geom_cache_key = (id(self.pts), self.steps)
+            self._geom_cache = (self.pts_interp, self.ds, self.track_len, self.dpds,
+                                self.d2pds2, self.r, self.apex, self.elevation, self.s)
 
         # calculate traction-limited velocity at each point
         self.v, self.gear, self.energy, self.time_list = self.get_velocity_list()
@@ -96,41 +389,45 @@ class LapSim:
         # find brake points
         self.brake = self.find_brake_pts()
 
-        # self.plot_discretized_points(apex=0, brake=0, elevation=0, index=1)            # check apex location
-
         # calculate lap time
         self.time = np.sum(self.time_list)
 
-        # self.plot_velocity(apex=0)
+        if self.plot:
+            self.plot_discretized_points(apex=1, brake=1)            # check apex/brake locations
+            self.plot_velocity(apex=1)
 
-        return 1   
+        return 1
 
 
     def discretize(self):
         
         # Parametrize track by variable s. Assume that the input points are ordered and arbitrarily spaced.
         # Parametrization with respect to normalized arc length
-        diff = np.roll(self.pts,-1,axis=1)-self.pts
-        arclen = np.linalg.norm(diff,axis=0)   # length of displacement vector
-        track_len = np.sum(arclen)
-        s = np.cumsum(arclen)/track_len
-        self.pts = self.pts/track_len*1000      # normalize track data to 1km total track length
+        diff = np.diff(self.pts, axis=1, append=self.pts[:,:1])
+        if len(self.pts) == 2:
+            arclen = np.hypot(diff[0], diff[1])     # length of displacement vector
+        else:
+            arclen = np.sqrt(diff[0]**2 + diff[1]**2 + diff[2]**2)
+        track_len = arclen.sum()
+        inv_tl = 1.0/track_len
+        np.cumsum(arclen, out=arclen)               # reuse the arclen buffer for the running arc length
+        arclen *= inv_tl
+        self._pts_scale = 1000*inv_tl               # input-to-normalized scale, kept for plotting
+        pts = self.pts*self._pts_scale              # local copy normalized to 1km total track length; self.pts keeps the input data
 
         # periodic boundary condition (x(0) == x(1), y(0) == y(1))
-        s = np.append(0,s)
+        s = np.concatenate(([0.], arclen))
         self.s = s
         snew = np.linspace(0,1,num=self.steps, endpoint=False)
-        dim = len(self.pts)
-        pts_interp = np.zeros((dim, self.steps))
+        dim = len(pts)
 
-        from scipy.interpolate import interp1d
+        from scipy.interpolate import CubicSpline
+
+        # close the track and interpolate all axes with one periodic spline solve
+        pts_closed = np.hstack([pts,pts[:,:1]])
+        cs = CubicSpline(s,pts_closed,axis=1,bc_type='periodic')
+        pts_interp = cs(snew)
 
-        for i in np.arange(dim):
-            x = np.append(self.pts[i],self.pts[i,0])
-            fx = interp1d(s,x,kind='cubic', fill_value='extrapolate')
-            xnew = fx(snew)
-            pts_interp[i] = xnew
-        
         if dim == 3:
             xdiff = pts_interp[0] - np.roll(pts_interp[0],1,axis=0)
             ydiff = pts_interp[1] - np.roll(pts_interp[1],1,axis=0)
@@ -139,6 +436,11 @@ class LapSim:
         else:
             self.elevation = np.zeros(len(pts_interp[0]))
 
+        # grade trig is fixed once the track is discretized; the integrator
+        # reads these instead of calling sin/cos per step
+        self._sin_elev = np.sin(self.elevation)
+        self._cos_elev = np.cos(self.elevation)
+
         ds = 1000/self.steps
 
         return pts_interp, ds, 1000
@@ -150,21 +452,34 @@ class LapSim:
         r(s) = |(dxds^2+dyds^2)^(3/2)/(dxds*dyds2-dyds*dxds2)|
         '''
 
-        diff = ((self.pts_interp - np.roll(self.pts_interp,1,axis=1))+(np.roll(self.pts_interp,-1,axis=1)-self.pts_interp))/2
+        # central differences on slices (wrap-around handled explicitly) to avoid np.roll copies
+        diff = np.empty_like(self.pts_interp)
+        diff[:,1:-1] = (self.pts_interp[:,2:] - self.pts_interp[:,:-2])*0.5
+        diff[:,0] = (self.pts_interp[:,1] - self.pts_interp[:,-1])*0.5
+        diff[:,-1] = (self.pts_interp[:,0] - self.pts_interp[:,-2])*0.5
         dpds = diff[:2]/self.ds
 
-        diff2 = ((dpds - np.roll(dpds,1,axis=1))+(np.roll(dpds,-1,axis=1)-dpds))/2
-        d2pds2 = diff2[:2]/self.ds
+        diff2 = np.empty_like(dpds)
+        diff2[:,1:-1] = (dpds[:,2:] - dpds[:,:-2])*0.5
+        diff2[:,0] = (dpds[:,1] - dpds[:,-1])*0.5
+        diff2[:,-1] = (dpds[:,0] - dpds[:,-2])*0.5
+        d2pds2 = diff2/self.ds
 
-        num = np.linalg.norm(dpds,axis=0)**3
-        den = np.absolute(np.cross(dpds,d2pds2,axis=0))
-        r = num/den
+        # explicit 2D cross product and squared-norm power; np.cross/linalg.norm
+        # go through generic n-d machinery for what is scalar arithmetic here
+        num = (dpds[0]*dpds[0] + dpds[1]*dpds[1])**1.5
+        den = np.absolute(dpds[0]*d2pds2[1] - dpds[1]*d2pds2[0])
+        r = np.divide(num, den, out=num)
 
         r[np.isnan(r)] = np.inf
 
-        r = (r+np.roll(r, 1, axis=0)+ np.roll(r, -1, axis=0))/3
-        
-        return dpds, d2pds2, r
+        # 3-point moving average with periodic wrap
+        r_smooth = np.empty_like(r)
+        r_smooth[1:-1] = (r[:-2] + r[1:-1] + r[2:])/3
+        r_smooth[0] = (r[-1] + r[0] + r[1])/3
+        r_smooth[-1] = (r[-2] + r[-1] + r[0])/3
+
+        return dpds, d2pds2, r_smooth
 
     
     def find_apex(self):
@@ -174,21 +489,18 @@ class LapSim:
 
         '''
 
-        dr = self.r - np.roll(self.r,1,axis=0)
-        sign = np.sign(dr)
-        sign_flip = sign - np.roll(sign,-1,axis=0)
+        # apex points are local minima of r (no sign/sign_flip temporaries or extra reduction pass);
+        # <= on the trailing side keeps one point of a flat-bottomed minimum
+        r = self.r
+        local_min = (r <= np.concatenate((r[-1:], r[:-1]))) & (r < np.concatenate((r[1:], r[:1])))
+        apex = np.where(local_min)
 
-        s = np.arange(self.steps)
-        apex = np.where((sign_flip == np.min(sign_flip)))
-
-        # apex_min = np.argmin(self.r)
-        idx_0 = self.r.shape[0]-apex[0][0]
-        idx = np.arange(self.r.shape[0]) - idx_0
-
-        # re-indexing to make apex the first point
+        # re-indexing to make the first apex the first point; a single roll
+        # instead of building an index array and fancy-indexing each array
+        shift = -int(apex[0][0])
         apex = apex-apex[0][0]
-        self.r = self.r[idx]
-        self.pts_interp = self.pts_interp[:,idx]
+        self.r = np.roll(self.r, shift)
+        self.pts_interp = np.roll(self.pts_interp, shift, axis=1)
 
         return apex
 
@@ -207,64 +519,46 @@ class LapSim:
         '''
 
         self.car.alimy = self.g * self.car.muy                           # lateral traction limit
-        energy_list = np.zeros((self.steps,2))
+
+        # constants recomputed on every step before; cache them once per run
+        self._wheel_circ = self.car.wheel_radius*0.0254*2*np.pi          # wheel circumference [m]
+        self._motor_trans = float(self.car.motor.trans)
+        if self.car.hybrid == 1:
+            self._trans01 = self.car.engine.trans[0]*self.car.engine.trans[1]
+            self._trans_from_gear2 = self.car.engine.trans[2:]*self._trans01  # wheel rpm -> engine rpm per gear
+
+        self._kernel_params = self.kernel_params()                       # flat powertrain parameters for the JIT kernels
         v, gear = self.v_apex()                                         # velocity and gear at apex
-        time = np.zeros(self.steps)
-
-        i = 0
-        apex_idx = 0
-        state = 'f'
-        gear[0] = 1
-
-        # get velocity list
-        while i<self.steps:
-            if state == 'f':                                                        # forward
-                if v[np.remainder(i+1, self.steps)]==0:
-                    ap = v[i]**2/self.r[np.remainder(i+1, self.steps)]*np.cos(self.elevation[i])
-                    if self.car.alimy>ap:                                                # below traction limit
-                        i1 = np.remainder(i+1, self.steps)                           # step forward
-                        roc = self.r[np.remainder(i+1, self.steps)]
-                        elevation = self.elevation[np.remainder(i+1, self.steps)]
-                        v[i1], gear[i1], energy_list[i1],time[i1]= self.calc_velocity_3D(vin=v[i],ap=ap, gear=int(gear[i]),roc=roc, elevation=elevation)
-                        i = i1
-                    else:                                                           # traction is lost
-                        state = 'b'
-                        apex_idx= np.remainder(apex_idx+1, len(self.apex[0]))
-                        print('losing traction, jumping to apex '+str(apex_idx+1), ' at i=',self.apex[0][apex_idx], ', current i=',i)
-                        i = self.apex[0][apex_idx]
-                else:                                                               # check if velocity at next apex can be achieved with the current gear
-                    if np.min(v)==0:                                                  # reaching an apex without braking
-                        i = np.remainder(i+1, self.steps)
-                        apex_idx = np.remainder(apex_idx+1, len(self.apex[0]))
-                    else:
-                        print('reached end of track')
-                        break
-            elif state == 'b':                                                  # backward
-                ap = v[i]**2/self.r[i-1]*np.cos(self.elevation[i])
-                if v[i-1]==0:                                                   # if velocity is not yet calculated
-                    roc = self.r[np.remainder(i-1, self.steps)]
-                    elevation = self.elevation[np.remainder(i-1, self.steps)]
-                    v[i-1], gear[i-1], energy_list[i-1], time[i-1] = self.calc_velocity_3D(vin=v[i],ap=ap, gear=int(gear[i]),roc=roc, elevation=elevation)
-                    i-=1
-                else:                                                           # if velocity is calculated from forward integration
-                    if self.car.alimy<ap:                                        # if the previous point is an apex; loosing traction
-                        print('losing traction (back), start integrating forward from apex '+str(apex_idx+1))
-                        state = 'f'
-                        i = self.apex[0][apex_idx]
-                    else:                                                       # if still can accelerate
-                        roc = self.r[np.remainder(i-1, self.steps)]
-                        elevation = self.elevation[np.remainder(i-1, self.steps)]
-                        vb, gearb, energyb, timeb = self.calc_velocity_3D(vin=v[i],ap=ap, gear=int(gear[i]),roc=roc, elevation=elevation)
-                        if vb < v[i-1]:                                          # continue backward integration
-                            v[i-1] = vb
-                            energy_list[i-1] = energyb
-                            time[i-1] = timeb
-                            gear[i-1] = gearb
-                            i-=1
-                        else:                                                       # found brake point 
-                            print('reached break point, start integrating forward from apex '+str(apex_idx+1))
-                            state = 'f'
-                            i = self.apex[0][apex_idx]
+        apex = np.asarray(self.apex[0], dtype=np.int64)
+
+        # integrate (JIT kernel); per-step power draw is recorded and energy is accounted afterwards
+        p_ICE_list, p_EM_list, time, limit, events = _integrate(self.steps, self.r, self._sin_elev,
+                                                                self._cos_elev, apex, v, gear,
+                                                                self.car.alimy, self.ds,
+                                                                self._kernel_params)
+        self.limit = limit                                               # limiting mechanism per step (-1 for apex points)
+
+        if self.verbose:
+            # replay event log recorded by the kernel
+            for code, apex_idx, i in events:
+                if code == 1:
+                    print('losing traction, jumping to apex '+str(apex_idx+1), ' at i=',self.apex[0][apex_idx], ', current i=',i)
+                elif code == 2:
+                    print('reached end of track')
+                elif code == 3:
+                    print('losing traction (back), start integrating forward from apex '+str(apex_idx+1))
+                elif code == 4:
+                    print('reached break point, start integrating forward from apex '+str(apex_idx+1))
+            # one-line summary of the limiting mechanism per step
+            counts = np.bincount(limit[limit>=0], minlength=4)
+            print('Limited steps: power =',counts[0],', traction =',counts[1],\
+                ', lateral traction =',counts[2],', rpm =',counts[3])
+
+        # energy accounting outside the kernel, batched over all recorded steps
+        energy_list = np.zeros((self.steps,2))
+        sel = limit>=0
+        energy_list[sel,0] = self.calc_fuel_list(gear[sel], v[sel], p_ICE_list[sel], time[sel])
+        energy_list[sel,1] = p_EM_list[sel]*time[sel]/(self.car.motor.eta/100)
 
         energy_list, time = self.e_apex(v, gear, energy_list, time)
         dec = np.where(np. sign(v-np.roll(v,-1))==1)                 # decelerating points
@@ -272,227 +566,129 @@ class LapSim:
 
         return v, gear, energy_list, time
 
+    def kernel_params(self):
+        '''
+        CarParams struct (scalars and plain arrays) consumed by the JIT kernels
+        For electric cars the engine entries are unused placeholders
+        '''
+
+        if self.car.hybrid == 1:
+            eng_trans = np.asarray(self.car.engine.trans, dtype=np.float64)
+            eng_maxrpm = float(self.car.engine.maxrpm)
+            eng_minrpm = float(self.car.engine.minrpm)
+            power_rpm = np.linspace(eng_minrpm, eng_maxrpm, 1024)        # snapshot of the power curve for in-kernel lookup
+            power_hp = np.asarray(self.car.engine.power(power_rpm), dtype=np.float64)
+        else:
+            eng_trans = np.ones(3)
+            eng_maxrpm = 0.
+            eng_minrpm = 0.
+            power_rpm = np.array([0.,1.])
+            power_hp = np.zeros(2)
+
+        return CarParams(hybrid=int(self.car.hybrid), power_split=float(self.car.power_split),
+                         m=float(self.car.m), g=self.g, rho_air=self.rho_air,
+                         cd=float(self.car.cd), a_front=float(self.car.a),
+                         wheel_radius=float(self.car.wheel_radius),
+                         eng_trans=eng_trans, eng_maxrpm=eng_maxrpm, eng_minrpm=eng_minrpm,
+                         power_rpm=power_rpm, power_hp=power_hp,
+                         motor_trans=float(self.car.motor.trans), motor_maxrpm=float(self.car.motor.maxrpm),
+                         motor_torque_con=float(self.car.motor.torque_con))
+
     def v_apex(self):
+        '''
+        Traction/rpm-limited velocity and initial gear at every apex, vectorized over all apex points
+        '''
+
+        p = self._kernel_params
 
         v = np.zeros(self.steps)
         gear = np.zeros(self.steps)
-        
-        for i in self.apex[0]:
-            v_trac = np.sqrt(self.car.muy * self.g * np.cos(self.elevation[i]) * self.r[i])
-            rpm0 = v_trac/(self.car.wheel_radius*0.0254*2*np.pi)*60
-            if self.car.hybrid == 1:
-                _, maxrpm, gear[i] = self.v_lim_hybrid(v_trac, 0, rpm0, self.elevation[i])
-            else:
-                _, maxrpm = self.v_lim_electric(v_trac, rpm0, self.elevation[i])
-                gear[i] = 1
-            v_rpm = maxrpm/60*(self.car.wheel_radius*0.0254*2*np.pi)
-            v[i] = np.min([v_trac,v_rpm])
-            
+        ai = np.asarray(self.apex[0])
+
+        v_trac = np.sqrt(self.car.muy * self.g * self._cos_elev[ai] * self.r[ai])
+        rpm0 = v_trac/self._wheel_circ*60
+
+        if p.hybrid == 1:
+            r = 0.95                                                            # set the max rpm
+            rpm_list = rpm0[:,None]*self._trans_from_gear2                      # (n_apex, n_gears) rpm matrix
+            valid = (p.eng_maxrpm*r>rpm_list) & (p.eng_minrpm<rpm_list)
+            first = np.argmax(valid, axis=1)                                    # first possible gear per apex
+            any_valid = valid[np.arange(len(ai)), first]
+            gear_apex = np.where(any_valid, first+1, 0)
+            # no gear in range: pick top/bottom gear if the whole range is over/under-revved
+            gear_apex[~any_valid & (np.min(rpm_list,axis=1)>p.eng_maxrpm*r)] = rpm_list.shape[1]
+            gear_apex[~any_valid & (np.max(rpm_list,axis=1)<p.eng_minrpm*r)] = 1
+            wheel_maxrpm_ICE = p.eng_maxrpm/(p.eng_trans[gear_apex+1]*self._trans01)
+            maxrpm = np.minimum(p.motor_maxrpm/self._motor_trans, wheel_maxrpm_ICE)
+            gear[ai] = gear_apex
+        else:
+            maxrpm = p.motor_maxrpm/self._motor_trans
+            gear[ai] = 1
+
+        v_rpm = maxrpm/60*self._wheel_circ
+        v[ai] = np.minimum(v_trac, v_rpm)
+
         return v, gear
 
     def e_apex(self, v=0, gear=0, energy_list=0, time=0):
-        
-        for i in self.apex[0]:
-            a = (v[i+1]**2-v[i]**2)/(2*self.ds)
-            if a == 0:
-                time[i]=self.ds/v[i]
-            else:
-                time[i] = (v[i+1]-v[i])/a
-            p_ICE = self.car.m * a * v[i] * (self.car.hybrid*self.car.power_split)
-            p_EM = self.car.m * a * v[i] - p_ICE
-
-            e_ICE = self.calc_fuel(gear[i], v[i], p_ICE, time[i])
-            e_EM = p_EM*time[i]/(self.car.motor.eta/100)
+        '''
+        Time and energy at the apex points, vectorized over all apexes
+        '''
 
-            energy_list[i] = [e_ICE, e_EM]
+        ai = np.asarray(self.apex[0])
+        a = (v[ai+1]**2-v[ai]**2)/(2*self.ds)
+        t_apex = self.ds/v[ai]                                           # a == 0: constant-speed step
+        np.divide(v[ai+1]-v[ai], a, out=t_apex, where=a!=0)
+        time[ai] = t_apex
 
-        return energy_list, time
+        p_ICE = self.car.m * a * v[ai] * (self.car.hybrid*self.car.power_split)
+        p_EM = self.car.m * a * v[ai] - p_ICE
 
-    def calc_velocity_3D (self,vin=0,ap=0,gear=1, roc=0, elevation=0):
+        energy_list[ai,0] = self.calc_fuel_list(gear[ai], v[ai], p_ICE, t_apex)
+        energy_list[ai,1] = p_EM*t_apex/(self.car.motor.eta/100)
 
-        # calculate rpm and check for shifting conditions
-        rpm0 = vin/(self.car.wheel_radius*0.0254*2*np.pi)*60    # rpm of wheels at current velocity
-        
-        if self.car.hybrid == 1:
-            a_tor, maxrpm, gear_new = self.v_lim_hybrid(vin, gear, rpm0, elevation)
-        else:
-            a_tor, maxrpm = self.v_lim_electric(vin, rpm0, elevation)
-            gear_new = 1
-
-        # torque-limited velocity [m/s]
-        v_tor = np.sqrt(2*a_tor*self.ds+vin**2)    # v^2-vi^2 = 2a*ds
-        t_tor = (v_tor-vin)/a_tor
-
-        # traction-limited velocity [m/s]                   
-        a_elev = self.g*np.sin(np.absolute(elevation))                          # loss in traction due to elevation change
-        a_trac = np.sqrt(self.car.alimy**2-ap**2)-a_elev
-        v_trac = np.sqrt(2*a_trac*self.ds+vin**2)  
-        t_trac = (v_trac-vin)/a_trac                                   
-
-        # lateral traction-limited velocity [m/s]
-        v_trac_l = np.sqrt(self.car.alimy*roc)
-        a_trac_l = (v_trac_l**2-vin**2)/(2*self.ds)
-        t_trac_l = (v_trac_l-vin)/a_trac_l 
-
-        # rpm-limited velocity [m/s]
-        v_rpm = maxrpm/60*(self.car.wheel_radius*0.0254*2*np.pi)
-        a_rpm = (v_rpm**2-vin**2)/(2*self.ds)
-        if a_rpm == 0:
-            t_rpm = self.ds/v_rpm
-        else:
-            t_rpm = (v_rpm-vin)/a_rpm
-
-        v = np.min([v_trac,v_tor,v_rpm,v_trac_l])
-        if v == v_tor:
-            t = t_tor
-            p_ICE = self.car.m * a_tor * v * (self.car.hybrid*self.car.power_split)
-            p_EM = self.car.m * a_tor * v - p_ICE
-            print('Power limited. Velocity =',v, ', ICE Power [hp] =', str('{0:.2f}'.format(p_ICE)), 'EM Power [hp] =', str('{0:.2f}'.format(p_EM/745.7)))
-        elif v == v_trac:
-            t = t_trac
-            p_ICE = self.car.m * a_trac * v * (self.car.hybrid*self.car.power_split)
-            p_EM = self.car.m * a_trac * v - p_ICE
-            print('Traction limited. Velocity =',v, ', ICE Power [hp] =', str('{0:.2f}'.format(p_ICE)), 'EM Power [hp] =', str('{0:.2f}'.format(p_EM/745.7)))
-        elif v == v_trac_l:
-            t = t_trac_l
-            p_ICE = self.car.m * a_trac_l * v * (self.car.hybrid*self.car.power_split)
-            p_EM = self.car.m * a_trac_l * v - p_ICE
-            print('Lateral traction limited. Velocity =',v, ', ICE Power [hp] =', str('{0:.2f}'.format(p_ICE)), 'EM Power [hp] =', str('{0:.2f}'.format(p_EM/745.7)))
-        elif v == v_rpm:
-            t = t_rpm
-            p_ICE = self.car.m * a_rpm * v * (self.car.hybrid*self.car.power_split)
-            p_EM = self.car.m * a_rpm * v - p_ICE
-            print('RPM limited. Velocity =',v, ', RPM at EM =', str('{0:.0f}'.format(maxrpm*self.car.motor.trans)), 'max EM RPM =', self.car.motor.maxrpm)
-
-        e_ICE = self.calc_fuel(gear_new, v, p_ICE, t)
-        e_EM = p_EM*t/(self.car.motor.eta/100)
-        
-        return v, gear_new, [e_ICE, e_EM], t
-    
+        return energy_list, time
 
-    def v_lim_hybrid(self, vin=0, gear=1, rpm0=0., elevation=0):
+    def calc_fuel_list(self, gear, v, Power, t):
         '''
-        Calculates velocity at the next discretized step (hybrid vehicles only)
-        - Integrate for traction-limited velocity 
-        - Calculate maximum acceleration allowed at the current power output and integrate for power-limited velocity
-        - Compare and return the lower value as the velocity at the next step
-        - Check rpm at each step and determine whether to shift gear
-        ICE+EM
+        ONLY FOR HYBRID VEHICLES
+        Vectorized fuel-energy accounting: one batched fuel-map lookup
+        over all recorded steps instead of one interpolator call per step
         '''
-        
-        # calculate rpm and check for shifting conditions
-        r = 0.95                                             # set the max rpm
-        rpm_list = rpm0*self.car.engine.trans[2:]*self.car.engine.trans[0]*self.car.engine.trans[1]   # rpm at all gears
-
-        # calculate Power output
-        if (gear == 1 and rpm_list[0]<self.car.engine.minrpm):
-            rpm_at_gear_new = rpm_list[0]                                                  
-            gear_new = gear
-            p_ICE = self.car.engine.power(self.car.engine.minrpm)                                       # use constant extrapolation for v near 0        
-        else:
-            rpm_idx = np.where((self.car.engine.maxrpm*r>rpm_list) & (self.car.engine.minrpm<rpm_list))       # index of possible rpm
-            if len(rpm_idx[0]) == 0:
-                rpm_at_gear_new = self.car.engine.maxrpm
-                if gear == 0:                                                                           # for initial gear calculation at apex
-                    if np.min(rpm_list)>self.car.engine.maxrpm*r:
-                        gear_new = len(self.car.engine.trans)-2
-                    elif np.max(rpm_list)<self.car.engine.minrpm*r:
-                        gear_new = 1
-                else:
-                    gear_new = gear
-            else:
-                gear_new = rpm_idx[0][0]+1                                                     # gear chosen for next step
-                rpm_at_gear_new = rpm_list[rpm_idx[0][0]]
-            p_ICE = self.car.engine.power(rpm_at_gear_new)                                          # ICE power output after shifting                              
-
-        # Power/rpm -> torque at the engine output (*gear ratio) -> torque at the wheel -> force at the wheel -> acceleration
-        omega_ICE = (rpm_at_gear_new/60)*(2*np.pi)                                           # angular velocity [rad/s] revolution per minute / 60s * 2pi
-        if omega_ICE != 0:
-            torque_ICE_at_wheel = (p_ICE*745.7/omega_ICE)*self.car.engine.trans[gear_new+1]  # always use maximum torque during acceleration
-        else:
-            torque_ICE_at_wheel = 0
-
-        # torque limited acceleration
-        torque_EM_at_wheel = self.car.motor.torque_con*self.car.motor.trans
-        omega_at_wheel = vin/(self.car.wheel_radius*0.0254)
-        total_power = (torque_EM_at_wheel+torque_ICE_at_wheel)*omega_at_wheel
-        p_elevation = self.car.m*self.g*np.sin(elevation)*vin
-        p_drag = 0.5*self.rho_air*self.car.cd*self.car.a*vin**3
-
-        effective_power = total_power - p_elevation - p_drag
-        a_tor = (effective_power/omega_at_wheel)/(self.car.wheel_radius*0.0254*self.car.m)
-        # a_tor_2 = (torque_EM_at_wheel+torque_ICE_at_wheel)/(self.car.wheel_radius*0.0254*self.car.m)
-        
-        # maxrpm determined by transmission
-        wheel_maxrpm_ICE = self.car.engine.maxrpm/(self.car.engine.trans[gear_new+1]*self.car.engine.trans[0]*self.car.engine.trans[1])     
-        wheel_maxrpm_EM = self.car.motor.maxrpm/self.car.motor.trans      
-        maxrpm = np.min([wheel_maxrpm_EM,wheel_maxrpm_ICE])
-        
-        if gear != gear_new:
-            print('Shifting...... Current gear:', gear_new)
-        
-        return a_tor, maxrpm, gear_new
 
+        e_ICE = np.zeros(len(v))
+        sel = Power != 0
+        if not np.any(sel):
+            return e_ICE
 
-    def v_lim_electric(self, vin=0, rpm0=0, elevation=0):
-        '''
-        Calculates velocity at the next discretized step
-        - Integrate for traction-limited velocity 
-        - Calculate maximum acceleration allowed at the current power output and integrate for power-limited velocity
-        - Compare and return the lower value as the velocity at the next step
-        - Check rpm at each step and determine whether to shift gear
-        EM only
-        '''
+        eta_map = self.car.engine.eta
+        gear_idx = np.asarray(gear[sel], dtype=np.int64)
+        rpm = v[sel]/self._wheel_circ*60*self.car.engine.trans[gear_idx+1]*self._trans01   # rpm at current gear
 
-        omega_at_wheel = rpm0/60*2*np.pi
+        # calculate energy consumed from fuel efficiency (constant interpolation outside the map)
+        x = np.clip(rpm/60*2*np.pi, np.min(eta_map[:,0]), np.max(eta_map[:,0]))     # ICE angular velocity [rad/s]
+        y = np.clip(Power[sel]/x, np.min(eta_map[:,1]), np.max(eta_map[:,1]))       # torque [Nm]
+        eta = self.get_eta_interp()(x,y)
 
-        # torque-limited velocity [m/s]
-        p_elevation = self.car.m*self.g*np.sin(elevation)*vin
-        p_drag = 0.5*self.rho_air*self.car.cd*self.car.a*vin**3
-        effective_power = self.car.motor.torque_con*self.car.motor.trans*omega_at_wheel-p_elevation-p_drag
+        e_ICE[sel] = Power[sel]*100/eta*t[sel]          # energy consumed by ICE [J]
 
-        a_tor = (effective_power/omega_at_wheel)/(self.car.wheel_radius*0.0254*self.car.m)
-        
-        # rpm-limited velocity [m/s]
-        maxrpm = self.car.motor.maxrpm/self.car.motor.trans
+        if np.any(np.isnan(eta)):
+            print('WARNING: ICE speed and/or torque are outside of the interpolation range.')
 
-        return a_tor, maxrpm
+        return e_ICE
 
 
-    def calc_fuel(self, gear, v, Power, t):
+    def get_eta_interp(self):
         '''
-        ONLY FOR HYBRID VEHICLES
-        Calculates the total energy consumed at a discrete step
-        ICE efficiency 2D interpolation of the fuel efficiency chart
-        EM efficiency is assumed to be a constant
+        Cached cubic interpolant of the engine fuel-efficiency map
         '''
 
-        if Power == 0:
-            return 0
+        if self._eta_interp is None:
+            # build the interpolant once; griddata would re-triangulate the fuel map per call
+            from scipy.interpolate import CloughTocher2DInterpolator
+            self._eta_interp = CloughTocher2DInterpolator(self.car.engine.eta[:,:2], self.car.engine.eta[:,2])
 
-        rpm = v/(self.car.wheel_radius*0.0254*2*np.pi)*60*self.car.engine.trans[int(gear)+1]*self.car.engine.trans[0]*self.car.engine.trans[1]   # rpm at current gear
-        
-        # calculate energy consumed from fuel efficiency
-        x = rpm/60*2*np.pi                  # ICE angular velocity [rad/s]
-        if x<np.min(self.car.engine.eta[:,0]):
-            x = np.min(self.car.engine.eta[:,0])                        # for low v, use constant interpolation for fuel efficiency
-        elif x>np.max(self.car.engine.eta[:,0]):
-            x = np.max(self.car.engine.eta[:,0])
-        y = Power/x                                       # torque [Nm]
-        if y<np.min(self.car.engine.eta[:,1]):
-            y = np.min(self.car.engine.eta[:,1])                        # for low v, use constant interpolation for fuel efficiency
-        elif y>np.max(self.car.engine.eta[:,1]):
-            y = np.max(self.car.engine.eta[:,1])
-        from scipy.interpolate import griddata
-        intmethod = 'cubic'
-        eta = griddata(self.car.engine.eta[:,:2], self.car.engine.eta[:,2], (x,y), method=intmethod)
-
-        e_ICE = Power*100/eta*t                 # energy consumed by ICE [J]
-
-        if np.isnan(eta):
-            print('WARNING: ICE speed and/or torque are outside of the interpolation range.')
-
-        return e_ICE
+        return self._eta_interp
 
 
     def find_brake_pts(self):
@@ -500,18 +696,17 @@ class LapSim:
         Find brake points from velocity list
         '''
 
-        v_diff = np.sign(self.v - np.roll(self.v, 1, axis=0))
-        sign_flip = v_diff - np.roll(v_diff,-1,axis=0)
-        brake = np.where(sign_flip == np.max(sign_flip))
+        # brake points are local maxima of v, counting the edges of flat-topped
+        # plateaus (rpm-limited stretches) but not their interior
+        vp = np.roll(self.v,1)
+        vn = np.roll(self.v,-1)
+        local_max = (self.v >= vp) & (self.v >= vn) & ((self.v > vp) | (self.v > vn))
+        brake = np.where(local_max)
 
         return brake
 
 
     def plot_discretized_points(self, apex=0, brake=0, elevation=0, index=0):
-        
-        from mpl_toolkits.axes_grid1 import make_axes_locatable
-        import matplotlib.cm as cmx
-        import matplotlib.colors
 
         fig = plt.figure(figsize=(8,6))
         ax = fig.add_subplot(111)
@@ -523,15 +718,16 @@ class LapSim:
             scalarMap = cmx.ScalarMappable(norm=cNorm, cmap=cm)
             ax.scatter(self.pts_interp[0], self.pts_interp[1],c=scalarMap.to_rgba(self.pts_interp[2]),s=10, label='interpolation')
         else:
-            plt.scatter(self.pts_interp[0], self.pts_interp[1],s=10,label='Interpolation')
-        plt.scatter(self.pts[0],self.pts[1],s=2,label='Input')
+            ax.plot(self.pts_interp[0], self.pts_interp[1],'o',markersize=3,label='Interpolation')
+        pts = self.pts*self._pts_scale              # input points on the normalized 1km scale of pts_interp
+        ax.plot(pts[0],pts[1],'o',markersize=1.5,label='Input')
         if index == 1:
-            for i in range(len(self.pts[0])):
-                ax.annotate(str(i)+'('+'{0:.3g}'.format(self.s[i]*100)+')',xy=(self.pts[0,i],self.pts[1,i]), xycoords='data')
+            for i in range(len(pts[0])):
+                ax.annotate(str(i)+'('+'{0:.3g}'.format(self.s[i]*100)+')',xy=(pts[0,i],pts[1,i]), xycoords='data')
         if apex==1:
-            plt.scatter(self.pts_interp[0,self.apex],self.pts_interp[1,self.apex],c='g',marker='^',label='apex')
+            ax.plot(self.pts_interp[0,self.apex][0],self.pts_interp[1,self.apex][0],'^g',label='apex')
         if brake==1:
-            plt.scatter(self.pts_interp[0,self.brake],self.pts_interp[1,self.brake],c='r',marker='x',label='brake')
+            ax.plot(self.pts_interp[0,self.brake][0],self.pts_interp[1,self.brake][0],'xr',label='brake')
         plt.title('Discretized Track points (equidistant track length sampling)')
         plt.legend()
         if elevation == 1:
@@ -545,10 +741,6 @@ class LapSim:
     
     def plot_velocity(self, apex=0):
 
-        from mpl_toolkits.axes_grid1 import make_axes_locatable
-        import matplotlib.cm as cmx
-        import matplotlib.colors
-
         v = self.v*2.237                        # convert to [mph]
         fig2 = plt.figure(figsize=(8,6))
         ax = fig2.add_subplot(111)
@@ -561,7 +753,7 @@ class LapSim:
         # for i in range(len(self.pts_interp[0])):
         #     ax.annotate(str(i),xy=(self.pts_interp[0,i],self.pts_interp[1,i]), xycoords='data')
         if apex==1:
-            plt.scatter(self.pts_interp[0,self.apex],self.pts_interp[1,self.apex],c='r',marker='x',label='apex')
+            ax.plot(self.pts_interp[0,self.apex][0],self.pts_interp[1,self.apex][0],'xr',label='apex')
             plt.legend(fontsize=10)
         plt.xlabel('X [m]', fontsize=10)
         plt.ylabel('Y [m]', fontsize=10)
@@ -583,7 +775,7 @@ class LapSim:
         fig = plt.figure(figsize=(8,6))
         ax1 = fig.add_subplot(111)
         ax1.set_aspect('equal')
-        plt.scatter(self.pts_interp[0],self.pts_interp[1],label='Discretized points')
+        ax1.plot(self.pts_interp[0],self.pts_interp[1],'o',markersize=3,label='Discretized points')
         plt.quiver(self.pts_interp[0],self.pts_interp[1],self.dpds[0],self.dpds[1],linewidth=0.5,label='dpds')
         plt.quiver(self.pts_interp[0],self.pts_interp[1],self.d2pds2[0],self.d2pds2[1],label='d2pds2')
         plt.title('Curvature')
@@ -1,5 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import matplotlib.cm as cmx
+import matplotlib.colors
 from car import Car
 
 class Acc:
@@ -34,6 +36,11 @@ class Acc:
 
         self.car = kwargs.pop('car',0)                  # Car class
 
+        self.verbose = kwargs.pop('verbose',False)      # print integration diagnostics
+
+        self._eta_interp = None                         # cached fuel-map interpolator (built on first use)
+        self._power_rpm = None                          # cached engine power-curve samples (built on first use)
+
     @classmethod
     def init_straight(cls, **kwargs):
         '''
@@ -121,16 +128,25 @@ class Acc:
         v_rpm = maxrpm/60*(self.car.wheel_radius*0.0254*2*np.pi)
         t_rpm = self.ds/v_rpm
 
-        v = np.min([v_trac,v_tor,v_rpm])
-        if v == v_tor:
-            t = t_tor
-            print('Power limited. ICE Power [hp] =', str('{0:.2f}'.format(p_ICE)), 'EM Power [hp] =', str('{0:.2f}'.format(p_EM/745.7)))
-        elif v == v_trac:
+        # pick the binding limit with a scalar comparison chain (ties keep the earlier branch)
+        v = v_tor
+        t = t_tor
+        limit = 0
+        if v_trac < v:
+            v = v_trac
             t = t_trac
-            print('Traction limited. ICE Power [hp] =', str('{0:.2f}'.format(p_ICE)), 'EM Power [hp] =', str('{0:.2f}'.format(p_EM/745.7)))
-        elif v == v_rpm:
+            limit = 1
+        if v_rpm < v:
+            v = v_rpm
             t = t_rpm
-            print('RPM limited. RPM at EM =', maxrpm*self.car.motor.trans, 'max EM RPM =', self.car.motor.maxrpm)
+            limit = 2
+        if self.verbose:
+            if limit == 0:
+                print('Power limited. ICE Power [hp] =', str('{0:.2f}'.format(p_ICE)), 'EM Power [hp] =', str('{0:.2f}'.format(p_EM/745.7)))
+            elif limit == 1:
+                print('Traction limited. ICE Power [hp] =', str('{0:.2f}'.format(p_ICE)), 'EM Power [hp] =', str('{0:.2f}'.format(p_EM/745.7)))
+            else:
+                print('RPM limited. RPM at EM =', maxrpm*self.car.motor.trans, 'max EM RPM =', self.car.motor.maxrpm)
 
         e_ICE = self.calc_fuel(gear_new, v, p_ICE, t)
         e_EM = p_EM*t/(self.car.motor.eta/100)
@@ -148,6 +164,11 @@ class Acc:
         ICE+EM
         '''
         
+        if self._power_rpm is None:
+            # sample the power curve once; np.interp beats a cubic interp1d call per step
+            self._power_rpm = np.linspace(self.car.engine.minrpm, self.car.engine.maxrpm, 1024)
+            self._power_hp = self.car.engine.power(self._power_rpm)
+
         # calculate rpm and check for shifting conditions
         r = 0.95                                             # set the max rpm
         rpm_list = rpm0*self.car.engine.trans[2:]*self.car.engine.trans[0]*self.car.engine.trans[1]   # rpm at all gears
@@ -156,17 +177,18 @@ class Acc:
         if (gear == 1 and rpm_list[0]<self.car.engine.minrpm):
             rpm_at_gear_new = rpm_list[0]                                                  
             gear_new = gear
-            p_ICE = self.car.engine.power(self.car.engine.minrpm)                                       # use constant extrapolation for v near 0        
+            p_ICE = np.interp(self.car.engine.minrpm, self._power_rpm, self._power_hp)                  # use constant extrapolation for v near 0
         else:
             rpm_idx = np.where((self.car.engine.maxrpm*r>rpm_list) & (self.car.engine.minrpm<rpm_list))       # index of possible rpm
             if len(rpm_idx[0]) == 0:
-                print('No higher gear available. Current gear:',gear,', Current rpm:', rpm_list[gear-1])
+                if self.verbose:
+                    print('No higher gear available. Current gear:',gear,', Current rpm:', rpm_list[gear-1])
                 rpm_at_gear_new = self.car.engine.maxrpm
                 gear_new = gear
             else:
                 gear_new = rpm_idx[0][0]+1                                                     # gear chosen for next step
                 rpm_at_gear_new = rpm_list[rpm_idx[0][0]]
-            p_ICE = self.car.engine.power(rpm_at_gear_new)                                          # ICE power output after shifting                              
+            p_ICE = np.interp(rpm_at_gear_new, self._power_rpm, self._power_hp)                     # ICE power output after shifting
 
         # Power/rpm -> torque at the engine output (*gear ratio) -> torque at the wheel -> force at the wheel -> acceleration
         omega_ICE = (rpm_at_gear_new/60)*(2*np.pi)                                           # angular velocity [rad/s] revolution per minute / 60s * 2pi
@@ -204,14 +226,14 @@ class Acc:
         # maxrpm determined by transmission
         wheel_maxrpm_ICE = self.car.engine.maxrpm/(self.car.engine.trans[gear_new+1]*self.car.engine.trans[0]*self.car.engine.trans[1])     
         wheel_maxrpm_EM = self.car.motor.maxrpm/self.car.motor.trans      
-        maxrpm = np.min([wheel_maxrpm_EM,wheel_maxrpm_ICE])
+        maxrpm = min(wheel_maxrpm_EM,wheel_maxrpm_ICE)
         
         if self.car.motor.acc_type == 'cap':
             p_EM = omega_EM*self.car.motor.torque_max              # Power = torque * omega
         else:
             p_EM = omega_EM*self.car.motor.torque_con              # Power = torque * omega
 
-        if gear != gear_new:
+        if self.verbose and gear != gear_new:
             print('Shifting...... Current gear:', gear_new)
         
         return a_tor, maxrpm, gear_new, p_EM, p_ICE
@@ -278,9 +300,11 @@ class Acc:
         y = Power*745.7/x                                       # torque [Nm]
         if y<self.car.engine.eta[0,1]:
             y = self.car.engine.eta[0,1]                        # for low v, use constant interpolation for fuel efficiency
-        from scipy.interpolate import griddata
-        intmethod = 'cubic'
-        eta = griddata(self.car.engine.eta[:,:2], self.car.engine.eta[:,2], (x,y), method=intmethod)
+        if self._eta_interp is None:
+            # build the cubic interpolant once; griddata would re-triangulate the fuel map per call
+            from scipy.interpolate import CloughTocher2DInterpolator
+            self._eta_interp = CloughTocher2DInterpolator(self.car.engine.eta[:,:2], self.car.engine.eta[:,2])
+        eta = self._eta_interp(x,y)
 
         e_ICE = Power*100/eta*745.7*t                 # energy consumed by ICE [J]
 
@@ -295,19 +319,18 @@ class Acc:
         Find brake points from velocity list
         '''
 
-        v_diff = np.sign(self.v - np.roll(self.v, 1, axis=0))
-        sign_flip = v_diff - np.roll(v_diff,-1,axis=0)
-        brake = np.where(sign_flip == np.max(sign_flip))
+        # brake points are local maxima of v, counting the edges of flat-topped
+        # plateaus (rpm-limited stretches) but not their interior
+        vp = np.roll(self.v,1)
+        vn = np.roll(self.v,-1)
+        local_max = (self.v >= vp) & (self.v >= vn) & ((self.v > vp) | (self.v > vn))
+        brake = np.where(local_max)
 
         return brake
 
     
     def plot_velocity(self):
 
-        from mpl_toolkits.axes_grid1 import make_axes_locatable
-        import matplotlib.cm as cmx
-        import matplotlib.colors
-
         t = [np.sum(self.time_list[:i+1]) for i in np.arange(self.steps)]
 
         v = self.v*2.237                        # convert to [mph]